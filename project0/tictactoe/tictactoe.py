@@ -3,12 +3,52 @@ Tic Tac Toe Player
 """
 
 import math
-from copy import deepcopy
 
 X = "X"
 O = "O"
 EMPTY = None
 
+# Every (i, j) cell of the board, so loops don't need to rebuild ranges
+CELLS = [(i, j) for i in range(3) for j in range(3)]
+
+# The search encodes a board as two 9-bit ints, one for the X's and one for
+# the O's, where the bit 3 * i + j marks a piece on the cell (i, j)
+FULL = 0b111111111
+WIN_MASKS = [
+    0b000000111, 0b000111000, 0b111000000,  # Rows
+    0b001001001, 0b010010010, 0b100100100,  # Columns
+    0b100010001, 0b001010100                # Diagonals
+]
+# WINS[bits] tells if the pieces on bits complete any line, so the search
+# can check for a winner with a single lookup
+WINS = [any((bits & mask) == mask for mask in WIN_MASKS)
+        for bits in range(FULL + 1)]
+
+# The 8 rotations and reflections of the board, as maps of the cell (i, j)
+TRANSFORMS = [
+    lambda i, j: (i, j),
+    lambda i, j: (j, 2 - i),
+    lambda i, j: (2 - i, 2 - j),
+    lambda i, j: (2 - j, i),
+    lambda i, j: (i, 2 - j),
+    lambda i, j: (2 - i, j),
+    lambda i, j: (j, i),
+    lambda i, j: (2 - j, 2 - i)
+]
+
+# Transposition table: maps an already searched board (in its canonical form,
+# see canonicalBits) to its value and to a flag telling if that value is exact
+# or only a lower/upper bound (alpha-beta cuts the search short, so not every
+# stored value is exact)
+TT = {}
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# Optimal move (as a bit) for every reachable board, keyed by its canonical
+# form. It's filled by buildPolicy on the first call to minimax
+POLICY = {}
+
 
 def initial_state():
     """
@@ -23,21 +63,13 @@ def player(board):
     """
     Returns player who has the next turn on a board.
     """
-    contX = 0
-    contO = 0
-    for i in range(3):
-        for j in range(3):
-            if board[i][j] == X:
-                contX += 1
-            elif board[i][j] == O:
-                contO += 1
-    
     # The X always starts the game.
-    # So, if the number of X and O are equal, it's time for X to play
-    if contX == contO:
-        return X
-    else:
-        return O
+    # So, if an even number of cells is filled, it's time for X to play
+    filled = 0
+    for i, j in CELLS:
+        if board[i][j] is not EMPTY:
+            filled += 1
+    return X if filled % 2 == 0 else O
 
 
 def actions(board):
@@ -45,13 +77,7 @@ def actions(board):
     Returns set of all possible actions (i, j) available on the board.
     """
     # Possible actions are the empty spots on the board
-    possibleActions = set()
-    for i in range(3):
-        for j in range(3):
-            if board[i][j] == EMPTY:
-                possibleActions.add((i, j))
-    
-    return possibleActions
+    return {(i, j) for i, j in CELLS if board[i][j] is EMPTY}
 
 
 def result(board, action):
@@ -59,7 +85,8 @@ def result(board, action):
     Returns the board that results from making move (i, j) on the board.
     """
     # The original board should be left unmodified
-    newBoard = deepcopy(board)
+    # Copying each row is enough, since the cells are immutable
+    newBoard = [row[:] for row in board]
     # Make the move on the copied board
     newBoard[action[0]][action[1]] = player(board)
     # Returns the copied board
@@ -70,34 +97,7 @@ def winner(board):
     """
     Returns the winner of the game, if there is one.
     """
-    # Check rows
-    for i in range(3):
-        if board[i][0] == X and board[i][1] == X and board[i][2] == X:
-            return X
-        if board[i][0] == O and board[i][1] == O and board[i][2] == O:
-            return O
-    
-    # Check columns
-    for j in range(3):
-        if board[0][j] == X and board[1][j] == X and board[2][j] == X:
-            return X
-        if board[0][j] == O and board[1][j] == O and board[2][j] == O:
-            return O
-    
-    # Check one diagonal
-    if board[0][0] == X and board[1][1] == X and board[2][2] == X:
-        return X
-    if board[0][0] == O and board[1][1] == O and board[2][2] == O:
-        return O
-    
-    # Check the other diagonal
-    if board[2][0] == X and board[1][1] == X and board[0][2] == X:
-        return X
-    if board[2][0] == O and board[1][1] == O and board[0][2] == O:
-        return O
-    
-    # If there is no winner
-    return None
+    return winnerBits(*toBits(board))
 
 
 def terminal(board):
@@ -106,10 +106,9 @@ def terminal(board):
     """
     isThereWinner = winner(board)
     if isThereWinner is None:
-        for i in range(3):
-            for j in range(3):
-                if board[i][j] == EMPTY:
-                    return False
+        for i, j in CELLS:
+            if board[i][j] is EMPTY:
+                return False
     
     # If there is a winner or if there is no empty space, then the game is over
     return True
@@ -128,53 +127,251 @@ def utility(board):
         return -1
 
 
+def toBits(board):
+    """
+    Returns the board encoded as the pair of ints (xBits, oBits).
+    """
+    xBits = 0
+    oBits = 0
+    for i, j in CELLS:
+        if board[i][j] == X:
+            xBits |= 1 << (3 * i + j)
+        elif board[i][j] == O:
+            oBits |= 1 << (3 * i + j)
+    return xBits, oBits
+
+
+def winnerBits(xBits, oBits):
+    """
+    Returns the winner of the game encoded as bits, if there is one.
+    """
+    if WINS[xBits]:
+        return X
+    if WINS[oBits]:
+        return O
+    return None
+
+
+def evaluateBits(xBits, oBits):
+    """
+    Returns the utility of the game encoded as bits if it is over,
+    None otherwise. Checks for the winner only once.
+    """
+    isThereWinner = winnerBits(xBits, oBits)
+    if isThereWinner is X:
+        return 1
+    elif isThereWinner is O:
+        return -1
+    elif (xBits | oBits) == FULL:
+        return 0
+    return None
+
+
+def symmetryTable(transform):
+    """
+    Returns a list that maps every 9-bit board to its transformed version.
+    """
+    table = []
+    for bits in range(FULL + 1):
+        newBits = 0
+        for i, j in CELLS:
+            if bits & 1 << (3 * i + j):
+                ti, tj = transform(i, j)
+                newBits |= 1 << (3 * ti + tj)
+        table.append(newBits)
+    return table
+
+
+def inverseTable(table):
+    """
+    Returns the list that undoes the map made by a symmetry table.
+    """
+    inverse = [0] * (FULL + 1)
+    for bits in range(FULL + 1):
+        inverse[table[bits]] = bits
+    return inverse
+
+
+SYMMETRIES = [symmetryTable(transform) for transform in TRANSFORMS]
+INVERSES = [inverseTable(table) for table in SYMMETRIES]
+
+
+def canonicalBits(xBits, oBits):
+    """
+    Returns the same key for every board that is a rotation or a
+    reflection of the given one, since they all have the same value.
+    """
+    return min((table[xBits], table[oBits]) for table in SYMMETRIES)
+
+
+def canonicalSymmetry(xBits, oBits):
+    """
+    Returns the index of the symmetry that turns the board into the
+    canonical form returned by canonicalBits.
+    """
+    return min(range(len(SYMMETRIES)),
+               key=lambda s: (SYMMETRIES[s][xBits], SYMMETRIES[s][oBits]))
+
+
+def lookup(key, alpha, beta):
+    """
+    Returns the value stored in the TT for the board, if it can be used
+    within the (alpha, beta) window. Returns None otherwise.
+    """
+    hit = TT.get(key)
+    if hit is None:
+        return None
+    value, flag = hit
+    if flag == EXACT:
+        return value
+    if flag == LOWER and value >= beta:
+        return value
+    if flag == UPPER and value <= alpha:
+        return value
+    return None
+
+
 def minimax(board):
     """
     Returns the optimal action for the current player on the board.
     """
+    xBits, oBits = toBits(board)
+    if evaluateBits(xBits, oBits) is not None:
+        return None
+    if not POLICY:
+        buildPolicy()
+    # Find the move for the canonical version of the board,
+    # then bring it back to the board that was given
+    s = canonicalSymmetry(xBits, oBits)
+    key = (SYMMETRIES[s][xBits], SYMMETRIES[s][oBits])
+    bit = POLICY.get(key)
+    if bit is None:
+        # Boards that can't be reached in a real game are searched directly
+        bit = bestMoveBits(*key)
+    return divmod(INVERSES[s][bit].bit_length() - 1, 3)
+
+
+def buildPolicy():
+    """
+    Solves every board reachable from the initial state a single time,
+    storing the optimal move for its canonical form in POLICY.
+    """
+    boards = [(0, 0)]
+    while boards:
+        key = canonicalBits(*boards.pop())
+        if key in POLICY or evaluateBits(*key) is not None:
+            continue
+        POLICY[key] = bestMoveBits(*key)
+        xBits, oBits = key
+        xToGo = bin(xBits | oBits).count("1") % 2 == 0
+        free = FULL & ~(xBits | oBits)
+        while free:
+            bit = free & -free
+            free ^= bit
+            if xToGo:
+                boards.append((xBits | bit, oBits))
+            else:
+                boards.append((xBits, oBits | bit))
+
+
+def bestMoveBits(xBits, oBits):
+    """
+    Returns the optimal move, as a bit, for the board encoded as bits.
+    """
     # The best move that the AI can do
     bestMove = None
-    playerToGo = player(board)
-    # If AI is X, AI should maximize the score
-    if playerToGo == X:
-        previousValue = -math.inf
-        for action in actions(board):
-            v = minValue(result(board, action))
-            if previousValue < v:
+    # Same rule as player(), but counting the bits
+    playerToGo = X if bin(xBits | oBits).count("1") % 2 == 0 else O
+    # The best scores already guaranteed for X (alpha) and O (beta)
+    alpha = -math.inf
+    beta = math.inf
+    # Moves that lead to symmetric boards have the same value,
+    # so only the first one of them needs to be searched
+    seen = set()
+    free = FULL & ~(xBits | oBits)
+    while free:
+        bit = free & -free
+        free ^= bit
+        # If AI is X, AI should maximize the score
+        if playerToGo == X:
+            key = canonicalBits(xBits | bit, oBits)
+            if key in seen:
+                continue
+            seen.add(key)
+            v = minValue(xBits | bit, oBits, alpha, beta)
+            if alpha < v:
                 # Maximize the score
-                previousValue = v
-                bestMove = action
-    # If AI is O, AI should minimize the score
-    elif playerToGo == O:
-        previousValue = math.inf
-        for action in actions(board):
-            v = maxValue(result(board, action))
-            if previousValue > v:
+                alpha = v
+                bestMove = bit
+        # If AI is O, AI should minimize the score
+        else:
+            key = canonicalBits(xBits, oBits | bit)
+            if key in seen:
+                continue
+            seen.add(key)
+            v = maxValue(xBits, oBits | bit, alpha, beta)
+            if beta > v:
                 # Minimize the score
-                previousValue = v
-                bestMove = action
+                beta = v
+                bestMove = bit
     return bestMove
 
 
-def maxValue(board):
+def maxValue(xBits, oBits, alpha=-math.inf, beta=math.inf):
     """
-    Returns the highest value of minValue(result(s,a))
+    Returns the highest value of minValue(result(s,a)),
+    pruning the branches that can't change the final decision
     """
+    u = evaluateBits(xBits, oBits)
+    if u is not None:
+        return u
+    # Each position only needs to be solved once
+    key = canonicalBits(xBits, oBits)
+    hit = lookup(key, alpha, beta)
+    if hit is not None:
+        return hit
+    alphaStart = alpha
     v = -math.inf
-    if terminal(board):
-        return utility(board)
-    for action in actions(board):
-        v = max(v, minValue(result(board, action)))
+    # Try every empty cell, one bit at a time
+    free = FULL & ~(xBits | oBits)
+    while free:
+        bit = free & -free
+        free ^= bit
+        v = max(v, minValue(xBits | bit, oBits, alpha, beta))
+        # O already has a better option elsewhere, so stop searching here
+        if v >= beta:
+            TT[key] = (v, LOWER)
+            return v
+        alpha = max(alpha, v)
+    TT[key] = (v, UPPER if v <= alphaStart else EXACT)
     return v
 
 
-def minValue(board):
+def minValue(xBits, oBits, alpha=-math.inf, beta=math.inf):
     """
-    Returns the lowest value of maxValue(result(s,a))
+    Returns the lowest value of maxValue(result(s,a)),
+    pruning the branches that can't change the final decision
     """
+    u = evaluateBits(xBits, oBits)
+    if u is not None:
+        return u
+    # Each position only needs to be solved once
+    key = canonicalBits(xBits, oBits)
+    hit = lookup(key, alpha, beta)
+    if hit is not None:
+        return hit
+    betaStart = beta
     v = math.inf
-    if terminal(board):
-        return utility(board)
-    for action in actions(board):
-        v = min(v, maxValue(result(board, action)))
-    return v
\ No newline at end of file
+    # Try every empty cell, one bit at a time
+    free = FULL & ~(xBits | oBits)
+    while free:
+        bit = free & -free
+        free ^= bit
+        v = min(v, maxValue(xBits, oBits | bit, alpha, beta))
+        # X already has a better option elsewhere, so stop searching here
+        if v <= alpha:
+            TT[key] = (v, UPPER)
+            return v
+        beta = min(beta, v)
+    TT[key] = (v, LOWER if v >= betaStart else EXACT)
+    return v
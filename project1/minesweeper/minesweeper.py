@@ -2,6 +2,23 @@ import itertools
 import random
 
 
+def neighbor_cells(height, width):
+    """
+    Returns a dict that maps each cell of the board to a tuple
+    of the cells within one row and column of it.
+    """
+    neighbors = {}
+    for i in range(height):
+        for j in range(width):
+            neighbors[i, j] = tuple(
+                (ni, nj)
+                for ni in range(max(i - 1, 0), min(i + 2, height))
+                for nj in range(max(j - 1, 0), min(j + 2, width))
+                if (ni, nj) != (i, j)
+            )
+    return neighbors
+
+
 class Minesweeper():
     """
     Minesweeper game representation
@@ -23,12 +40,22 @@ class Minesweeper():
             self.board.append(row)
 
         # Add mines randomly
+        # (mine_bits also keeps them as an int, where the bit
+        # i * width + j is set when there is a mine on the cell (i, j))
+        self.mine_bits = 0
         while len(self.mines) != mines:
             i = random.randrange(height)
             j = random.randrange(width)
             if not self.board[i][j]:
                 self.mines.add((i, j))
                 self.board[i][j] = True
+                self.mine_bits |= self.cell_bit((i, j))
+
+        # Bits of the cells within one row and column of each cell
+        self.neighbor_bits = {
+            cell: sum(map(self.cell_bit, neighbors))
+            for cell, neighbors in neighbor_cells(height, width).items()
+        }
 
         # At first, player has found no mines
         self.mines_found = set()
@@ -48,6 +75,12 @@ class Minesweeper():
             print("|")
         print("--" * self.width + "-")
 
+    def cell_bit(self, cell):
+        """
+        Returns the bit that represents a cell on the board.
+        """
+        return 1 << (cell[0] * self.width + cell[1])
+
     def is_mine(self, cell):
         i, j = cell
         return self.board[i][j]
@@ -59,23 +92,9 @@ class Minesweeper():
         not including the cell itself.
         """
 
-        # Keep count of nearby mines
-        count = 0
-
-        # Loop over all cells within one row and column
-        for i in range(cell[0] - 1, cell[0] + 2):
-            for j in range(cell[1] - 1, cell[1] + 2):
-
-                # Ignore the cell itself
-                if (i, j) == cell:
-                    continue
-
-                # Update count if cell in bounds and is mine
-                if 0 <= i < self.height and 0 <= j < self.width:
-                    if self.board[i][j]:
-                        count += 1
-
-        return count
+        # The nearby mines are the bits set both on the board
+        # and on the neighborhood of the cell
+        return bin(self.mine_bits & self.neighbor_bits[cell]).count("1")
 
     def won(self):
         """
@@ -101,6 +120,12 @@ class Sentence():
     def __str__(self):
         return f"{self.cells} = {self.count}"
 
+    def key(self):
+        """
+        Returns a hashable value that is the same for equal sentences.
+        """
+        return (frozenset(self.cells), self.count)
+
     def known_mines(self):
         """
         Returns the set of all cells in self.cells known to be mines.
@@ -158,6 +183,19 @@ class MinesweeperAI():
         # List of sentences about the game known to be true
         self.knowledge = []
 
+        # Cells within one row and column of each cell
+        self.neighbors = neighbor_cells(height, width)
+
+        # Bit that represents each cell, see cells_to_bits
+        self.cell_bits = {
+            (i, j): 1 << (i * width + j)
+            for i in range(height) for j in range(width)
+        }
+
+        # Keys of the sentences in self.knowledge, to check if a sentence
+        # is already known without comparing it to every other one
+        self.knowledge_keys = set()
+
     def mark_mine(self, cell):
         """
         Marks a cell as a mine, and updates all knowledge
@@ -165,7 +203,10 @@ class MinesweeperAI():
         """
         self.mines.add(cell)
         for sentence in self.knowledge:
-            sentence.mark_mine(cell)
+            if cell in sentence.cells:
+                self.knowledge_keys.discard(sentence.key())
+                sentence.mark_mine(cell)
+                self.knowledge_keys.add(sentence.key())
 
     def mark_safe(self, cell):
         """
@@ -174,40 +215,46 @@ class MinesweeperAI():
         """
         self.safes.add(cell)
         for sentence in self.knowledge:
-            sentence.mark_safe(cell)
-    
-    def remove_empty_cells(self):
+            if cell in sentence.cells:
+                self.knowledge_keys.discard(sentence.key())
+                sentence.mark_safe(cell)
+                self.knowledge_keys.add(sentence.key())
+
+    def cells_to_bits(self, cells):
         """
-        Removes all sentences from self.knowledge where the number
-        of cells in set is equal to 0.
+        Returns the cells as an int, where the bit i * width + j
+        is set when the cell (i, j) is in cells.
         """
-        # Update self.knowledge
-        list_to_remove = []
-        for existing_sentence in self.knowledge:
-            if len(existing_sentence.cells) == 0:
-                list_to_remove.append(existing_sentence)
-        if len(list_to_remove) > 0:
-            for sentence_to_remove in list_to_remove:
-                self.knowledge.remove(sentence_to_remove)
-        list_to_remove.clear()
+        return sum(map(self.cell_bits.__getitem__, cells))
+
+    def add_sentence(self, sentence):
+        """
+        Adds a sentence to self.knowledge, if it isn't there yet.
+        """
+        key = sentence.key()
+        if key not in self.knowledge_keys:
+            self.knowledge_keys.add(key)
+            self.knowledge.append(sentence)
     
-    def remove_dup_sent(self):
-        """
-        Removes duplicated sentences from self.knowledge
-        """
-        list_to_verify = []
-        list_to_verify = self.knowledge.copy()
-        list_to_remove = []
-        while len(list_to_verify) != 0:
-            sentence_to_verify = list_to_verify.pop()
-            for sentence_to_check in list_to_verify:
-                if sentence_to_check == sentence_to_verify:
-                    list_to_remove.append(sentence_to_check)
-        if len(list_to_remove) > 0:
-            for sentence_to_remove in list_to_remove:
-                self.knowledge.remove(sentence_to_remove)
-        list_to_verify.clear()
-        list_to_remove.clear()
+    def clean_knowledge(self):
+        """
+        Removes duplicated sentences and sentences without cells
+        from self.knowledge, in a single pass.
+        """
+        # Two sentences are equal when they have the same cells and count,
+        # so that pair is used as a key to keep only the last of them
+        seen = set()
+        unique_sentences = []
+        for sentence in reversed(self.knowledge):
+            if not sentence.cells:
+                continue
+            key = sentence.key()
+            if key not in seen:
+                seen.add(key)
+                unique_sentences.append(sentence)
+        unique_sentences.reverse()
+        self.knowledge = unique_sentences
+        self.knowledge_keys = seen
     
     def add_knowledge(self, cell, count):
         """
@@ -234,76 +281,60 @@ class MinesweeperAI():
         # Create a new set
         new_set = set()
         # Loop over all cells within one row and column
-        for i in range(cell[0] - 1, cell[0] + 2):
-            for j in range(cell[1] - 1, cell[1] + 2):
-                # Ignore the cell itself
-                if (i, j) == cell:
-                    continue
-                # If it is, for sure, a mine cell, decrease 1 from count
-                # and do not add cell to knowledge
-                if (i,j) in self.mines:
-                    count -= 1
-                    continue
-                # If it is, for sure, a safe cell, ignore
-                if (i,j) in self.safes:
-                    continue
-                # Check if cell is in bounds
-                if 0 <= i < self.height and 0 <= j < self.width:
-                    new_set.add((i,j))
+        for neighbor in self.neighbors[cell]:
+            # If it is, for sure, a mine cell, decrease 1 from count
+            # and do not add cell to knowledge
+            if neighbor in self.mines:
+                count -= 1
+            # If it is, for sure, a safe cell, ignore
+            elif neighbor not in self.safes:
+                new_set.add(neighbor)
         # If count is equal to 0, then all neighboring cells are safe
         if count == 0:
             for each_cell in new_set:
                 self.mark_safe(each_cell)
-        # Otherwise, a new sentence is created
-        else:
-            new_sentence = Sentence(new_set, count)
-            # Ensure that new_sentence is not in self.knowledge yet
-            already_exists = False
-            for old_sentence in self.knowledge:
-                if old_sentence == new_sentence:
-                    already_exists = True
-                    continue
-            if not already_exists:
-                self.knowledge.append(new_sentence)
+        # Otherwise, a new sentence is created (if there is any cell left)
+        elif new_set:
+            self.add_sentence(Sentence(new_set, count))
         
         # 4) mark any additional cells as safe or as mines
         for inquiry_sentence in self.knowledge:
             # Safe cells
-            inquiry_safe_set = set()
+            # (the sets are copied, since marking a cell removes it from
+            # inquiry_sentence, and self.mark_* also keeps the keys updated)
             inquiry_safe_set = inquiry_sentence.known_safes()
             if inquiry_safe_set is not None:
-                for count in range(len(inquiry_safe_set)):
-                    inquiry_cell = inquiry_safe_set.pop()
-                    inquiry_sentence.mark_safe(inquiry_cell)
+                for inquiry_cell in inquiry_safe_set.copy():
                     self.mark_safe(inquiry_cell)
             # Mine cells
-            inquiry_mine_set = set()
             inquiry_mine_set = inquiry_sentence.known_mines()
             if inquiry_mine_set is not None:
-                for count in range(len(inquiry_mine_set)):
-                    inquiry_cell = inquiry_mine_set.pop()
-                    inquiry_sentence.mark_mine(inquiry_cell)
+                for inquiry_cell in inquiry_mine_set.copy():
                     self.mark_mine(inquiry_cell)
         
         # Update self.knowledge
-        self.remove_empty_cells()
-        self.remove_dup_sent()
+        self.clean_knowledge()
         
         # 5) add any new sentences to the AI's knowledge base
-        all_sentences = []
-        all_sentences = self.knowledge.copy()
+        # A smaller sentence y that is a subset of x gives the new
+        # sentence (x - y) = x.count - y.count. Only strictly smaller
+        # sentences can be proper subsets, so the others aren't checked.
+        # The cells are turned into bits once, so each subset test
+        # is a single AND
         sentence_to_write = []
-        for x in self.knowledge:
-            for y in all_sentences:
-                if x == y:
-                    pass
-                else:
-                    if y.cells.issubset(x.cells):
-                        inferred_set = set()
-                        inferred_set = x.cells.difference(y.cells)
-                        inferred_count = x.count - y.count
-                        inferred_sentence = Sentence(inferred_set, inferred_count)
-                        sentence_to_write.append(inferred_sentence)
+        inferred_keys = set()
+        all_bits = [self.cells_to_bits(s.cells) for s in self.knowledge]
+        all_sizes = [len(s.cells) for s in self.knowledge]
+        for x, x_bits, x_size in zip(self.knowledge, all_bits, all_sizes):
+            for y, y_bits, y_size in zip(self.knowledge, all_bits, all_sizes):
+                if y_size < x_size and (x_bits & y_bits) == y_bits:
+                    inferred_set = x.cells.difference(y.cells)
+                    inferred_count = x.count - y.count
+                    # The same sentence may be inferred from different pairs
+                    key = (frozenset(inferred_set), inferred_count)
+                    if key not in inferred_keys:
+                        inferred_keys.add(key)
+                        sentence_to_write.append(Sentence(inferred_set, inferred_count))
         
         if len(sentence_to_write) > 0:
             for z in sentence_to_write:
@@ -311,19 +342,11 @@ class MinesweeperAI():
                     for each_cell in z.cells:
                         self.mark_safe(each_cell)               
                 else:
-                    already_exists = False
-                    for old_sentence in self.knowledge:
-                        if old_sentence == z:
-                            already_exists = True
-                            continue
-                    if not already_exists:
-                        self.knowledge.append(z)
-        all_sentences.clear()
+                    self.add_sentence(z)
         sentence_to_write.clear()
 
         # Update self.knowledge
-        self.remove_empty_cells()
-        self.remove_dup_sent()
+        self.clean_knowledge()
         
     def make_safe_move(self):
         """
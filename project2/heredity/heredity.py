@@ -1,5 +1,5 @@
 import csv
-import itertools
+import numpy as np
 import sys
 
 PROBS = {
@@ -36,6 +36,25 @@ PROBS = {
     "mutation": 0.01
 }
 
+# Probabilities of a gene mutating or not while passed on
+MUT = PROBS["mutation"]
+NO_MUT = 1 - PROBS["mutation"]
+
+# Probability of a parent passing (or not passing) the gene to the child,
+# indexed by the number of genes the parent has
+PROB_PARENT = (MUT, 0.5, NO_MUT)
+PROB_NOT_PARENT = (NO_MUT, 0.5, MUT)
+
+# The same probabilities as arrays, indexed by the number of genes
+# (and, for traits, by 0 or 1 for not having or having the trait)
+GENE_ARRAY = np.array([PROBS["gene"][0], PROBS["gene"][1], PROBS["gene"][2]])
+TRAIT_ARRAY = np.array([
+    [PROBS["trait"][genes][False], PROBS["trait"][genes][True]]
+    for genes in range(3)
+])
+PARENT_ARRAY = np.array(PROB_PARENT)
+NOT_PARENT_ARRAY = np.array(PROB_NOT_PARENT)
+
 
 def main():
 
@@ -60,26 +79,49 @@ def main():
         for person in people
     }
 
+    names = list(people)
+
+    # Whether each person is known to have the trait, and the indexes of the
+    # people whose trait is unknown (the only ones whose trait can vary)
+    known_trait = np.array([people[person]["trait"] is True for person in names], dtype=int)
+    unknown = np.array([i for i, person in enumerate(names) if people[person]["trait"] is None], dtype=int)
+
+    # Every possible assignment of genes, with one row per assignment
+    # and one column per person (all of them are handled at once)
+    genes = np.stack(
+        np.unravel_index(np.arange(3 ** len(names)), (3,) * len(names)),
+        axis=1
+    )
+    # The probability of the genes doesn't depend on the traits,
+    # so it's computed once and reused for every set of people with the trait
+    prob_genes = genes_probability(people, names, genes)
+
+    # Sum of the joint probabilities of each assignment of genes, and of
+    # each person not having (column 0) or having (column 1) the trait
+    gene_totals = np.zeros(len(genes))
+    trait_totals = np.zeros((len(names), 2))
+
     # Loop over all sets of people who might have the trait
-    names = set(people)
-    for have_trait in powerset(names):
-
-        # Check if current set of people violates known information
-        fails_evidence = any(
-            (people[person]["trait"] is not None and
-             people[person]["trait"] != (person in have_trait))
-            for person in names
-        )
-        if fails_evidence:
-            continue
-
-        # Loop over all sets of people who might have the gene
-        for one_gene in powerset(names):
-            for two_genes in powerset(names - one_gene):
-
-                # Update probabilities with new joint probability
-                p = joint_probability(people, one_gene, two_genes, have_trait)
-                update(probabilities, one_gene, two_genes, have_trait, p)
+    # Only people with an unknown trait are chosen, so every set agrees
+    # with the known information. Sets are enumerated as ints, where the
+    # bit i means that the person unknown[i] is in the set
+    for unknown_mask in powerset_masks(len(unknown)):
+
+        # Joint probability of each assignment of genes with this set
+        have_trait = known_trait.copy()
+        have_trait[unknown] = (unknown_mask >> np.arange(len(unknown))) & 1
+        p = prob_genes * TRAIT_ARRAY[genes, have_trait].prod(axis=1)
+
+        # Update probabilities with new joint probabilities
+        gene_totals += p
+        np.add.at(trait_totals, (np.arange(len(names)), have_trait), p.sum())
+
+    for i, person in enumerate(names):
+        person_genes = np.bincount(genes[:, i], weights=gene_totals, minlength=3)
+        for number_of_genes in range(3):
+            probabilities[person]["gene"][number_of_genes] = float(person_genes[number_of_genes])
+        probabilities[person]["trait"][False] = float(trait_totals[i, 0])
+        probabilities[person]["trait"][True] = float(trait_totals[i, 1])
 
     # Ensure probabilities sum to 1
     normalize(probabilities)
@@ -116,16 +158,12 @@ def load_data(filename):
     return data
 
 
-def powerset(s):
+def powerset_masks(n):
     """
-    Return a list of all possible subsets of set s.
+    Return all possible subsets of n elements, as ints where
+    the bit i is set when the i-th element is in the subset.
     """
-    s = list(s)
-    return [
-        set(s) for s in itertools.chain.from_iterable(
-            itertools.combinations(s, r) for r in range(len(s) + 1)
-        )
-    ]
+    return range(1 << n)
 
 
 def joint_probability(people, one_gene, two_genes, have_trait):
@@ -139,8 +177,25 @@ def joint_probability(people, one_gene, two_genes, have_trait):
         * everyone in set `have_trait` has the trait, and
         * everyone not in set` have_trait` does not have the trait.
     """
+    prob_joint = gene_probability(people, one_gene, two_genes)
+
+    # Get the probability of each person does or does not having a particular trait
+    # This value is picked up from PROBS
+    for person in people:
+        person_gene = get_gene(person, one_gene, two_genes)
+        person_trait = get_trait(person, have_trait)
+        prob_joint = PROBS["trait"][person_gene][person_trait] * prob_joint
+
+    return prob_joint
+
+
+def gene_probability(people, one_gene, two_genes):
+    """
+    Compute and return the probability that everyone has the number of
+    genes given by `one_gene` and `two_genes`, regardless of the traits.
+    """
     # Initialize probabilities to be calculated
-    prob_joint = prob_gene_person = prob_trait_person = 1.0
+    prob_genes = prob_gene_person = 1.0
     prob_mother = prob_not_mother = prob_father = prob_not_father = 1.0
 
     # Iterate through each person in the dictionary
@@ -156,10 +211,10 @@ def joint_probability(people, one_gene, two_genes, have_trait):
         if mother is not None and father is not None:
             mother_gene = get_gene(mother, one_gene, two_genes)
             father_gene = get_gene(father, one_gene, two_genes)
-            prob_mother = get_prob_parent(mother_gene)
-            prob_father = get_prob_parent(father_gene)
-            prob_not_mother = get_prob_not_parent(mother_gene)
-            prob_not_father = get_prob_not_parent(father_gene)
+            prob_mother = PROB_PARENT[mother_gene]
+            prob_father = PROB_PARENT[father_gene]
+            prob_not_mother = PROB_NOT_PARENT[mother_gene]
+            prob_not_father = PROB_NOT_PARENT[father_gene]
             if person_gene == 2:
                 prob_gene_person = prob_mother * prob_father
             elif person_gene == 1:
@@ -168,23 +223,44 @@ def joint_probability(people, one_gene, two_genes, have_trait):
                 prob_gene_person = prob_not_mother * prob_not_father
         # Else, the value is picked up from PROBS
         else:
-            dict_gene = {
-                o_k: {i_k: i_v for i_k, i_v in o_v.items() if i_k == person_gene}
-                    for o_k, o_v in PROBS.items() if o_k == "gene"}
-            prob_gene_person = dict_gene["gene"][person_gene]
-        
-        # Get the probability of the person does or does not having a particular trait
-        # This value is picked up from PROBS
-        person_trait = get_trait(person, have_trait)
-        dict_trait = {
-            o_k: {m_k: {i_k: i_v for i_k, i_v in m_v.items() if i_k == person_trait}
-                    for m_k, m_v in o_v.items() if m_k == person_gene}
-                for o_k, o_v in PROBS.items() if o_k == "trait"}
-        prob_trait_person = dict_trait["trait"][person_gene][person_trait]
-        
-        prob_joint = prob_gene_person * prob_trait_person * prob_joint
-    
-    return prob_joint
+            prob_gene_person = PROBS["gene"][person_gene]
+
+        prob_genes = prob_gene_person * prob_genes
+
+    return prob_genes
+
+
+def genes_probability(people, names, genes):
+    """
+    Compute and return, for each row of `genes`, the probability that
+    every person in `names` has the number of genes in the matching column,
+    regardless of the traits.
+    """
+    index = {person: i for i, person in enumerate(names)}
+    prob_genes = np.ones(len(genes))
+    for i, person in enumerate(names):
+        mother = people[person]["mother"]
+        father = people[person]["father"]
+
+        # If it is possible to determine the person's mother and father,
+        # then, it is necessary to calculate the probability
+        if mother is not None and father is not None:
+            mother_genes = genes[:, index[mother]]
+            father_genes = genes[:, index[father]]
+            prob_mother = PARENT_ARRAY[mother_genes]
+            prob_father = PARENT_ARRAY[father_genes]
+            prob_not_mother = NOT_PARENT_ARRAY[mother_genes]
+            prob_not_father = NOT_PARENT_ARRAY[father_genes]
+            prob_genes *= np.choose(genes[:, i], [
+                prob_not_mother * prob_not_father,
+                (prob_mother * prob_not_father) + (prob_not_mother * prob_father),
+                prob_mother * prob_father
+            ])
+        # Else, the value is picked up from PROBS
+        else:
+            prob_genes *= GENE_ARRAY[genes[:, i]]
+
+    return prob_genes
 
 
 def update(probabilities, one_gene, two_genes, have_trait, p):
@@ -207,19 +283,13 @@ def normalize(probabilities):
     Update `probabilities` such that each probability distribution
     is normalized (i.e., sums to 1, with relative proportions the same).
     """
-    dict_gene = {}
-    dict_trait = {}
     for person in probabilities:
-        # Loop through all possible values for "gene" to normalize them
-        for i in range(len(probabilities[person]["gene"])):
-            dict_gene[i] = probabilities[person]["gene"][i]
-        for i in range(len(probabilities[person]["gene"])):
-            probabilities[person]["gene"][i] = dict_gene[i] / sum(dict_gene.values())
-        # Loop through all possible values for "trait" to normalize them
-        for i in range(len(probabilities[person]["trait"])):
-            dict_trait[i] = probabilities[person]["trait"][i]
-        for i in range(len(probabilities[person]["trait"])):
-            probabilities[person]["trait"][i] = dict_trait[i] / sum(dict_trait.values())
+        # Sum each distribution only once, then divide all its values by it
+        for field in ("gene", "trait"):
+            distribution = probabilities[person][field]
+            total = sum(distribution.values())
+            for value in distribution:
+                distribution[value] /= total
 
 
 def get_gene(person, one_gene, two_genes):
@@ -231,24 +301,6 @@ def get_gene(person, one_gene, two_genes):
         return 0
 
 
-def get_prob_parent(number_of_genes):
-    if number_of_genes == 1:
-        return 0.5
-    elif number_of_genes == 2:
-        return 1 - PROBS["mutation"]
-    else:
-        return PROBS["mutation"]
-
-
-def get_prob_not_parent(number_of_genes):
-    if number_of_genes == 1:
-        return 0.5
-    elif number_of_genes == 2:
-        return PROBS["mutation"]
-    else:
-        return 1 - PROBS["mutation"]
-
-
 def get_trait(person, have_trait):
     if person in have_trait:
         return True
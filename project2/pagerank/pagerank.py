@@ -1,11 +1,23 @@
+import multiprocessing
+import numpy as np
 import os
-import random
 import re
 import sys
 
+from scipy.sparse import csr_matrix, diags
+
 
 DAMPING = 0.85
 SAMPLES = 10000
+BATCH = 4096
+
+# Number of processes that sample at the same time, for at least
+# PARALLEL_SAMPLES samples (fewer are sampled faster than processes start)
+PROCESSES = os.cpu_count() or 1
+PARALLEL_SAMPLES = 1000000
+
+# Links in an HTML page, compiled once for every page
+LINK_RE = re.compile(rb"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
 
 
 def main():
@@ -31,20 +43,20 @@ def crawl(directory):
     pages = dict()
 
     # Extract all links from HTML files
-    for filename in os.listdir(directory):
-        if not filename.endswith(".html"):
-            continue
-        with open(os.path.join(directory, filename)) as f:
-            contents = f.read()
-            links = re.findall(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"", contents)
-            pages[filename] = set(links) - {filename}
+    # (files are read as bytes, so only the links have to be decoded)
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            filename = entry.name
+            if not filename.endswith(".html"):
+                continue
+            with open(entry.path, "rb") as f:
+                contents = f.read()
+                links = {link.decode() for link in LINK_RE.findall(contents)}
+                pages[filename] = links - {filename}
 
     # Only include links to other pages in the corpus
     for filename in pages:
-        pages[filename] = set(
-            link for link in pages[filename]
-            if link in pages
-        )
+        pages[filename].intersection_update(pages)
 
     return pages
 
@@ -58,19 +70,42 @@ def transition_model(corpus, page, damping_factor):
     linked to by `page`. With probability `1 - damping_factor`, choose
     a link at random chosen from all pages in the corpus.
     """
-    prob_dist = {}
-
     number_pages_corpus = len(corpus)
-    number_links = len(corpus[page])
-    
-    for pagex in corpus:
-        if pagex in corpus[page]:
-            prob = (damping_factor / number_links) + ((1 - damping_factor) / number_pages_corpus)
-        else:
-            prob = (1 - damping_factor) / number_pages_corpus
-        prob_dist[pagex] = prob
+    links = corpus[page]
+
+    # A page that has no links at all should be interpreted as having
+    # one link for every page in the corpus (including itself)
+    if not links:
+        return {pagex: 1 / number_pages_corpus for pagex in corpus}
+
+    # Probabilities of choosing a page at random, and of following a link,
+    # computed once for all pages
+    prob_random = (1 - damping_factor) / number_pages_corpus
+    prob_link = prob_random + damping_factor / len(links)
+
+    return {
+        pagex: prob_link if pagex in links else prob_random
+        for pagex in corpus
+    }
+
+
+def link_matrix(corpus):
+    """
+    Return the list of pages in the corpus, and a sparse CSR matrix
+    where the row i has a 1 in the column j if pages[i] links to pages[j].
+    """
+    pages = list(corpus)
+    index = {page: i for i, page in enumerate(pages)}
+
+    # The links of pages[i] are indices[indptr[i]:indptr[i + 1]]
+    indptr = [0]
+    indices = []
+    for page in pages:
+        indices.extend(index[link] for link in corpus[page])
+        indptr.append(len(indices))
 
-    return prob_dist
+    data = np.ones(len(indices))
+    return pages, csr_matrix((data, indices, indptr), shape=(len(pages), len(pages)))
 
 
 def sample_pagerank(corpus, damping_factor, n):
@@ -82,51 +117,76 @@ def sample_pagerank(corpus, damping_factor, n):
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
     """
-    # Page rank
-    page_rank = {}
-    for x in corpus:
-        page_rank[x] = 0
+    pages, links = link_matrix(corpus)
+
+    # The links of each page, as plain lists for fast indexing
+    indptr = links.indptr.tolist()
+    indices = links.indices.tolist()
+
+    # Page rank, as the number of times each page was sampled
+    # Many samples are split into independent chains, one per process,
+    # and their counts are added up
+    if n < PARALLEL_SAMPLES or PROCESSES == 1:
+        counts = sample_chain(indptr, indices, damping_factor, n)
+    else:
+        seeds = np.random.SeedSequence().spawn(PROCESSES)
+        sizes = [n // PROCESSES + (i < n % PROCESSES) for i in range(PROCESSES)]
+        with multiprocessing.Pool(PROCESSES) as pool:
+            counts = sum(pool.starmap(sample_chain, [
+                (indptr, indices, damping_factor, size, seed)
+                for size, seed in zip(sizes, seeds)
+            ]))
 
-    # For the first time, choose a random page
-    corpus_pages = []
-    for x in corpus:
-        corpus_pages.append(x)
-    page = random.choice(corpus_pages)
-    page_rank[page] = 1
+    # Summarize and return
+    # (exactly one page was counted for each of the n samples)
+    ranks = counts / n
+    return {page: float(ranks[i]) for i, page in enumerate(pages)}
 
-    # List of pages to choose and their weight
-    pages_to_choose = []
-    pages_choose_weight = []
 
-    # Transition model
-    trans_mod = {}
+def sample_chain(indptr, indices, damping_factor, n, seed=None):
+    """
+    Return an array with the number of times each page is sampled by
+    a chain of `n` samples, starting with a page at random. The links
+    of the page i are indices[indptr[i]:indptr[i + 1]], as in link_matrix.
+    """
+    number_pages = len(indptr) - 1
+    rng = np.random.default_rng(seed)
+    counts = np.zeros(number_pages, dtype=np.int64)
+
+    # For the first time, choose a random page
+    page = int(rng.integers(number_pages))
+    counts[page] += 1
 
     # Repeat sampling N - 1 times because one page was already chosen
-    for i in range(n - 1):
-        # Get the transition model
-        trans_mod = transition_model(corpus, page, damping_factor)
-
-        # Loop through all items in the dictionary and add the key and the value to a list
-        for x, y in trans_mod.items():
-            pages_to_choose.append(x)
-            pages_choose_weight.append(y)
-        
-        # Draw a new page based on the transition model
-        page = random.choices(pages_to_choose, weights=pages_choose_weight, k=1)[0]
-
-        # Add 1 to the chosen page
-        page_rank[page] += 1
-
-        # Clear all collections
-        trans_mod.clear()
-        pages_to_choose.clear()
-        pages_choose_weight.clear()
-    
-    # Summarize and return
-    sample_rank = {}
-    for page in page_rank:
-        sample_rank[page] = page_rank[page] / sum(page_rank.values())
-    return sample_rank
+    # Random numbers are drawn BATCH at a time, instead of one call per sample:
+    # whether to jump, the page to jump to, and which link to follow otherwise.
+    # The chain itself has to be walked one sample at a time, but the pages
+    # of each batch are counted at once with bincount
+    remaining = n - 1
+    while remaining > 0:
+        size = min(BATCH, remaining)
+        jumps = (rng.random(size) < 1 - damping_factor).tolist()
+        targets = rng.integers(number_pages, size=size).tolist()
+        picks = rng.random(size).tolist()
+        remaining -= size
+
+        sampled = []
+        for jump, target, pick in zip(jumps, targets, picks):
+            # Same distribution as the transition model: with probability
+            # 1 - damping_factor (or if there are no links), choose any page
+            # in the corpus. Otherwise, follow one of the page's links
+            start = indptr[page]
+            end = indptr[page + 1]
+            if jump or start == end:
+                page = target
+            else:
+                page = indices[start + int(pick * (end - start))]
+            sampled.append(page)
+
+        # Add 1 to each chosen page
+        counts += np.bincount(sampled, minlength=number_pages)
+
+    return counts
 
 
 def iterate_pagerank(corpus, damping_factor):
@@ -138,48 +198,44 @@ def iterate_pagerank(corpus, damping_factor):
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
     """
-    # Each possible page i that links to page p
-    incoming = {}
-    for p in corpus:
-        incoming[p] = set()
-    for p in corpus:
-        for i in corpus[p]:
-            incoming[i].add(p)
-    
-    # Pages in corpus
-    corpus_pages = []
-    for x in corpus:
-        corpus_pages.append(x)
-    n = len(corpus_pages)
+    pages, links = link_matrix(corpus)
+    n = len(pages)
+
+    # Number of links of each page. A page that has no links at all should be
+    # interpreted as having one link for every page in the corpus (including itself)
+    number_links = np.asarray(links.sum(axis=1)).ravel()
+    dangling = number_links == 0
+
+    # transition[p, i] is the probability of going from page i to page p by
+    # following a link. It's stored by columns (CSC), so that each iteration
+    # is a single sparse matrix-vector product
+    # The damping factor is applied to the matrix once, instead of every iteration
+    transition = (diags(damping_factor / np.maximum(number_links, 1)) @ links).T.tocsc()
+
+    # Probability of going to any page at random, and of going to a
+    # page from each dangling page, which don't change between iterations
+    random_rank = (1 - damping_factor) / n
+    dangling_rank = damping_factor / n
 
     # Page rank
-    page_rank = {}
-    for page in corpus_pages:
-        page_rank[page] = 1 / n
-    
+    page_rank = np.full(n, 1 / n)
+
     diff = float('inf')
-    while diff > 0.001:
-        diff = 0
-        for page in corpus_pages:
-            # Apply page rank formula
-            p = (1 - damping_factor) / n
-            for i in incoming[page]:
-                if len(corpus[i]) > 0:
-                    p += damping_factor * sum([page_rank[i] / len(corpus[i])])
-                else:
-                    # A page that has no links at all should be interpreted 
-                    # as having one link for every page in the corpus (including itself)
-                    p += 1 / n
-            # Check whether the iteration is converging
-            diff = max(diff, abs(page_rank[page] - p))
-            # Update page_rank with the new p value
-            page_rank[page] = p
+    min_diff = 0.001 / n
+    while diff > min_diff:
+        # Apply page rank formula for all pages at once
+        # (in place, so each iteration allocates a single array)
+        new_rank = transition @ page_rank
+        new_rank += random_rank + dangling_rank * page_rank[dangling].sum()
+        # Check whether the iteration is converging
+        # (the old page rank isn't needed anymore, so it holds the differences)
+        np.subtract(new_rank, page_rank, out=page_rank)
+        diff = np.abs(page_rank, out=page_rank).max()
+        page_rank = new_rank
 
     # Summarize and return
-    iterate_rank = {}
-    for page in page_rank:
-        iterate_rank[page] = page_rank[page] / sum(page_rank.values())
-    return iterate_rank
+    page_rank /= page_rank.sum()
+    return {page: float(page_rank[i]) for i, page in enumerate(pages)}
 
 
 if __name__ == "__main__":
@@ -1,3 +1,4 @@
+from collections import Counter, defaultdict, deque
 from os import O_WRONLY
 import sys
 
@@ -11,11 +12,32 @@ class CrosswordCreator():
         Create new CSP crossword generate.
         """
         self.crossword = crossword
+
+        # Words grouped by length, so each domain starts with the words
+        # that fit its variable, instead of every word in the crossword
+        words_by_length = defaultdict(set)
+        for word in self.crossword.words:
+            words_by_length[len(word)].add(word)
         self.domains = {
-            var: self.crossword.words.copy()
+            var: words_by_length[var.length].copy()
+            for var in self.crossword.variables
+        }
+
+        # Neighbors of each variable, and the overlap of each pair of neighbors,
+        # so the crossword doesn't have to look for them every time
+        self.neighbors = {
+            var: frozenset(self.crossword.neighbors(var))
+            for var in self.crossword.variables
+        }
+        self.overlaps = {
+            (var, neighbor): self.crossword.overlaps[var, neighbor]
             for var in self.crossword.variables
+            for neighbor in self.neighbors[var]
         }
 
+        # Words used by the assignment that backtrack is searching
+        self.used_words = set()
+
     def letter_grid(self, assignment):
         """
         Return 2D array representing a given assignment.
@@ -65,6 +87,13 @@ class CrosswordCreator():
         font = ImageFont.truetype("assets/fonts/OpenSans-Regular.ttf", 80)
         draw = ImageDraw.Draw(img)
 
+        # Size of each letter, measured once instead of once per cell
+        # (textbbox from the origin gives the same width and height as textsize)
+        metrics = {
+            letter: draw.textbbox((0, 0), letter, font=font)[2:]
+            for row in letters for letter in row if letter
+        }
+
         for i in range(self.crossword.height):
             for j in range(self.crossword.width):
 
@@ -77,7 +106,7 @@ class CrosswordCreator():
                 if self.crossword.structure[i][j]:
                     draw.rectangle(rect, fill="white")
                     if letters[i][j]:
-                        w, h = draw.textsize(letters[i][j], font=font)
+                        w, h = metrics[letters[i][j]]
                         draw.text(
                             (rect[0][0] + ((interior_size - w) / 2),
                              rect[0][1] + ((interior_size - h) / 2) - 10),
@@ -91,7 +120,7 @@ class CrosswordCreator():
         Enforce node and arc consistency, and then solve the CSP.
         """
         self.enforce_node_consistency()
-        self.ac3()
+        self.ac4()
         return self.backtrack(dict())
 
     def enforce_node_consistency(self):
@@ -100,20 +129,12 @@ class CrosswordCreator():
         (Remove any values that are inconsistent with a variable's unary
          constraints; in this case, the length of the word.)
         """
-        # List to keep track of the words to remove
-        words_to_remove = []
-
-        # Loop through all variables and words in the variable
+        # Keep only the words with variable.length characters
+        # (the domains are built by length in __init__, so normally none is removed)
         for variable, words in self.domains.items():
-            for word in words:
-                if len(word) != variable.length:
-                    words_to_remove.append(word)
-            
-            # Removes the words with more or less characters than variable.length
-            if len(words_to_remove) > 0:
-                for word in words_to_remove:
-                    self.domains[variable].remove(word)
-            words_to_remove.clear()
+            self.domains[variable] = {
+                word for word in words if len(word) == variable.length
+            }
 
 
     def revise(self, x, y):
@@ -125,31 +146,36 @@ class CrosswordCreator():
         Return True if a revision was made to the domain of `x`; return
         False if no revision was made.
         """
-        # List to keep track of the words to remove
-        words_to_remove = []
+        return len(self.revise_words(x, y)) > 0
+
+
+    def revise_words(self, x, y):
+        """
+        Make variable `x` arc consistent with variable `y`, as in revise.
 
+        Return the list of words removed from `self.domains[x]`.
+        """
         # Gets the overlap between variables x and y
-        intersection = self.crossword.overlaps[x, y]
+        intersection = self.overlaps.get((x, y))
 
         if intersection is None:
-            return False
-        else:
-            # If a word in x domain has a correspondence in y domain, keep the word in x domain
-            for wordx in self.domains[x]:
-                flag = False
-                for wordy in self.domains[y]:
-                    if wordx[intersection[0]] == wordy[intersection[1]]:
-                        flag = True
-                        continue
-                if not flag:
-                    words_to_remove.append(wordx)
-        
-        if len(words_to_remove) > 0:
-            for word in words_to_remove:
-                self.domains[x].remove(word)
-            return True
-        else:
-            return False
+            return []
+
+        # A word in x domain has a correspondence in y domain if its letter
+        # at the overlap is one of the letters that words in y domain have there
+        # (so each domain is scanned once, instead of comparing every pair of words)
+        index_x, index_y = intersection
+        letters_y = {wordy[index_y] for wordy in self.domains[y]}
+
+        # List to keep track of the words to remove
+        words_to_remove = [
+            wordx for wordx in self.domains[x]
+            if wordx[index_x] not in letters_y
+        ]
+
+        for word in words_to_remove:
+            self.domains[x].remove(word)
+        return words_to_remove
 
 
     def ac3(self, arcs=None):
@@ -161,39 +187,132 @@ class CrosswordCreator():
         Return True if arc consistency is enforced and no domains are empty;
         return False if one or more domains end up empty.
         """
-        # List of arcs
-        arcs_list = []
+        # Queue of arcs, and the set of arcs in it to check membership in O(1)
+        arcs_queue = deque()
+        queued = set()
 
-        # Check whether arcs is None in order to fulfill arcs_list
+        # Check whether arcs is None in order to fill arcs_queue
         if arcs is None:
-            for var in self.crossword.variables:
-                neighbors = self.crossword.neighbors(var)
-                for neighbor in neighbors:
-                    if (neighbor, var) not in arcs_list:
-                        arcs_list.append((var, neighbor))
-        else:
-            arcs_list = arcs.copy()
-        
-        while len(arcs_list) != 0:
-            # Remove the arcs from the list
-            x = arcs_list[0][0]
-            y = arcs_list[0][1]
-            arcs_list = arcs_list[1:]
-            # If revise is true
-            if self.revise(x,y):
+            arcs = [
+                (var, neighbor)
+                for var in self.crossword.variables
+                for neighbor in self.neighbors[var]
+            ]
+        for arc in arcs:
+            if arc not in queued:
+                arcs_queue.append(arc)
+                queued.add(arc)
+
+        # Number of words in the domain of each variable with each letter, at
+        # each position that overlaps with a neighbor. A neighbor can only lose
+        # words when a letter disappears from the position it overlaps with
+        # (a variable's words are only counted once it loses some of them)
+        letter_counts = dict()
+
+        while arcs_queue:
+            # Remove the arc from the queue
+            x, y = arcs_queue.popleft()
+            queued.discard((x, y))
+            # If revise removed any word
+            words_removed = self.revise_words(x, y)
+            if words_removed:
                 # If the resulting domain of x is 0, the csp is unsolvable
                 if len(self.domains[x]) == 0:
                     return False
-                # Necessary to check if all the arcs associated to x are still consistent
+                # Count the words left in x, or update the counts of x
+                if x not in letter_counts:
+                    letter_counts[x] = {
+                        self.overlaps[x, neighbor][0]: Counter()
+                        for neighbor in self.neighbors[x]
+                    }
+                    for word in self.domains[x]:
+                        for position, counts in letter_counts[x].items():
+                            counts[word[position]] += 1
                 else:
-                    neighbors = self.crossword.neighbors(x)
-                    if y in neighbors:
-                        neighbors.remove(y)
-                    if len(neighbors) > 0:
-                        for neighbor in neighbors:
-                            if (x, neighbor) not in arcs_list and (neighbor, x) not in arcs_list:
-                                arcs_list.append((x, neighbor))
-        
+                    for word in words_removed:
+                        for position, counts in letter_counts[x].items():
+                            counts[word[position]] -= 1
+                # Positions of x where some letter isn't in any word anymore
+                positions_changed = {
+                    position
+                    for word in words_removed
+                    for position, counts in letter_counts[x].items()
+                    if counts[word[position]] == 0
+                }
+                # Necessary to check if the arcs associated to x at those
+                # positions are still consistent
+                for neighbor in self.neighbors[x] - {y}:
+                    if self.overlaps[x, neighbor][0] not in positions_changed:
+                        continue
+                    if (neighbor, x) not in queued:
+                        arcs_queue.append((neighbor, x))
+                        queued.add((neighbor, x))
+
+        return True
+
+
+    def ac4(self):
+        """
+        Update `self.domains` such that each variable is arc consistent,
+        like ac3 with all arcs, but keeping track of the support of each word.
+
+        Return True if arc consistency is enforced and no domains are empty;
+        return False if one or more domains end up empty.
+        """
+        # A word of x is supported by the words of a neighbor y that have its
+        # letter at the overlap. So the words of each variable are indexed by
+        # their letter at each position that overlaps with a neighbor, and a
+        # word loses all its support when the set of its letter at y is empty
+        words_by_letter = {
+            var: {
+                self.overlaps[var, neighbor][0]: defaultdict(set)
+                for neighbor in self.neighbors[var]
+            }
+            for var in self.crossword.variables
+        }
+        for var, positions in words_by_letter.items():
+            for word in self.domains[var]:
+                for position, words in positions.items():
+                    words[word[position]].add(word)
+
+        # Letters that disappeared from a position of a variable, and whose
+        # removal hasn't been propagated to the neighbors yet
+        removed_letters = []
+
+        def remove_words(var, words):
+            for word in words:
+                self.domains[var].remove(word)
+                for position, words_at in words_by_letter[var].items():
+                    letter = word[position]
+                    words_at[letter].discard(word)
+                    if not words_at[letter]:
+                        del words_at[letter]
+                        removed_letters.append((var, position, letter))
+            return len(self.domains[var]) > 0
+
+        # Remove the words that have no support at the start
+        for x in self.crossword.variables:
+            for y in self.neighbors[x]:
+                index_x, index_y = self.overlaps[x, y]
+                letters_y = words_by_letter[y][index_y]
+                for letter in list(words_by_letter[x][index_x]):
+                    if letter not in letters_y:
+                        words = words_by_letter[x][index_x][letter]
+                        if not remove_words(x, list(words)):
+                            return False
+
+        # When a letter disappears from y, the words of the neighbor x that
+        # overlap there with that letter have no support anymore
+        while removed_letters:
+            y, index_y, letter = removed_letters.pop()
+            for x in self.neighbors[y]:
+                if self.overlaps[y, x][0] != index_y:
+                    continue
+                index_x = self.overlaps[x, y][0]
+                words = words_by_letter[x][index_x].get(letter)
+                if words and not remove_words(x, list(words)):
+                    return False
+
         return True
 
 
@@ -244,7 +363,7 @@ class CrosswordCreator():
             for j in range(i + 1, len(list_of_variables)):
                 x = list_of_variables[i]
                 y = list_of_variables[j]
-                intersection = self.crossword.overlaps[x, y]
+                intersection = self.overlaps.get((x, y))
                 if intersection is not None:
                     wordx = assignment[x]
                     wordy = assignment[y]
@@ -254,6 +373,30 @@ class CrosswordCreator():
         return True
 
 
+    def consistent_after_add(self, assignment, var, value):
+        """
+        Return True if assigning `value` to `var` keeps a consistent
+        `assignment` consistent; return False otherwise.
+        Only the constraints that involve `var` are checked, since the
+        other ones were already satisfied.
+        """
+        # 1) The words must be distinct
+        if value in self.used_words:
+            return False
+
+        # 2) Every word is the correct length
+        if var.length != len(value):
+            return False
+
+        # 3) There are no conflicts between var and its assigned neighbors
+        for neighbor in self.neighbors[var] & assignment.keys():
+            index_x, index_y = self.overlaps[var, neighbor]
+            if value[index_x] != assignment[neighbor][index_y]:
+                return False
+
+        return True
+
+
     def order_domain_values(self, var, assignment):
         """
         Return a list of values in the domain of `var`, in order by
@@ -271,23 +414,18 @@ class CrosswordCreator():
         # Dictionary to keep track of how many words in var each word eliminates
         words_eliminated = {word:0 for word in self.domains[var]}
 
-        # List of all variables already defined
-        var_in_assignment = [var_assigned for var_assigned in assignment.keys()]
-
         # Get the number of words in other variables each word in var will eliminate
-        for random_var in self.crossword.variables:
-            if random_var != var and random_var not in var_in_assignment:
-                intersection = self.crossword.overlaps[var, random_var]
-                if intersection is not None:
-                    for wordx in self.domains[var]:
-                        for wordy in self.domains[random_var]:
-                            if wordx[intersection[0]] != wordy[intersection[1]]:
-                                words_eliminated[wordx] += 1
-        
-        words_eliminated_sorted = dict(sorted(words_eliminated.items(), key=lambda item: item[1]))
-        list_of_values = [word for word in words_eliminated_sorted.keys()]
-        
-        return list_of_values
+        # Only the unassigned neighbors of var overlap with it. A word eliminates
+        # the words of the neighbor that have a different letter at the overlap,
+        # so the letters of the neighbor's words are counted once per neighbor
+        for neighbor in self.neighbors[var] - assignment.keys():
+            index_x, index_y = self.overlaps[var, neighbor]
+            letters_y = Counter(wordy[index_y] for wordy in self.domains[neighbor])
+            number_words_y = len(self.domains[neighbor])
+            for wordx in self.domains[var]:
+                words_eliminated[wordx] += number_words_y - letters_y[wordx[index_x]]
+
+        return sorted(words_eliminated, key=words_eliminated.__getitem__)
 
 
     def select_unassigned_variable(self, assignment):
@@ -298,36 +436,13 @@ class CrosswordCreator():
         degree. If there is a tie, any of the tied variables are acceptable
         return values.
         """
-        # List of all variables already defined
-        var_in_assignment = [var_assigned for var_assigned in assignment.keys()]
-
-        # Dictionary to keep track of how many remaining values each variable has
-        words_in_var = {var:0 for var in self.crossword.variables if var not in var_in_assignment}
-
-        # Get the variable with the minimum number of remaining values
-        for random_var in self.crossword.variables:
-            if random_var not in var_in_assignment:
-                words_in_var[random_var] = len(self.domains[random_var])
-        
-        words_in_var_sorted = dict(sorted(words_in_var.items(), key=lambda item: item[1]))
-
-        # Check whether there is a tie in the number of variables with less words
-        list_of_variables = []
-        less_words = list(words_in_var_sorted.values())[0]
-        for var, n_words in words_in_var_sorted.items():
-            if n_words == less_words:
-                list_of_variables.append(var)
-        
-        # If only one variable has the minimum number of remaining words, this variable will be returned
-        if len(list_of_variables) == 1:
-            return list_of_variables[0]
-        # Else, if there is a tie, the variable with the highest degree will be returned
-        else:
-            largest_degree = {var:0 for var in list_of_variables}
-            for var_n in list_of_variables:
-                largest_degree[var_n] = len(self.crossword.neighbors(var_n))
-            largest_degree_sorted = dict(sorted(largest_degree.items(), key=lambda item: item[1]))
-            return list(largest_degree_sorted.keys())[-1]
+        # Variable with the minimum number of remaining values and, among those,
+        # the highest degree, found in a single pass over the unassigned variables
+        unassigned = self.crossword.variables - assignment.keys()
+        return min(
+            unassigned,
+            key=lambda var: (len(self.domains[var]), -len(self.neighbors[var]))
+        )
 
 
     def backtrack(self, assignment):
@@ -338,18 +453,34 @@ class CrosswordCreator():
         `assignment` is a mapping from variables (keys) to words (values).
 
         If no assignment is possible, return None.
+        """
+        # Words already in the partial assignment can't be used again
+        self.used_words = set(assignment.values())
+        return self.extend_assignment(assignment)
+
+
+    def extend_assignment(self, assignment):
+        """
+        Return a complete assignment that extends `assignment`, or None if
+        no assignment is possible, as in backtrack. `self.used_words` must
+        hold the words of `assignment`.
         """
          # Check if assignment is complete
+        # (a copy is returned, since the assignment is changed in place below)
         if self.assignment_complete(assignment):
-            return assignment
+            return dict(assignment)
         
         # Try a new variable
+        # The value is added to the assignment for the recursive call, and
+        # removed afterwards, instead of copying the assignment for each value
         var = self.select_unassigned_variable(assignment)
         for value in self.order_domain_values(var, assignment):
-            new_assignment = assignment.copy()
-            new_assignment[var] = value
-            if self.consistent(new_assignment):
-                result = self.backtrack(new_assignment)
+            if self.consistent_after_add(assignment, var, value):
+                assignment[var] = value
+                self.used_words.add(value)
+                result = self.extend_assignment(assignment)
+                del assignment[var]
+                self.used_words.discard(value)
                 if result is not None:
                     return result
         
@@ -1,12 +1,28 @@
-import csv
+import numpy as np
+import pandas as pd
 import sys
-from numpy.core.numeric import Infinity, NaN
 
 from sklearn.model_selection import train_test_split
 from sklearn.neighbors import KNeighborsClassifier
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
 
 TEST_SIZE = 0.4
 
+# Columns of the evidence, in order
+EVIDENCE_COLUMNS = [
+    "Administrative", "Administrative_Duration",
+    "Informational", "Informational_Duration",
+    "ProductRelated", "ProductRelated_Duration",
+    "BounceRates", "ExitRates", "PageValues", "SpecialDay", "Month",
+    "OperatingSystems", "Browser", "Region", "TrafficType",
+    "VisitorType", "Weekend"
+]
+
+# Months as they're written in the csv file, in order
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "June",
+          "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
 
 def main():
 
@@ -59,108 +75,26 @@ def load_data(filename):
 
     labels should be the corresponding list of labels, where each label
     is 1 if Revenue is true, and 0 otherwise.
-    """
-    # Define the evidence list
-    evidence = []
-
-    # Define the label list
-    label = []
 
-    # Load shopping.csv
-    with open(filename, encoding="utf-8") as file:
-        reader = csv.DictReader(file)
-        for row in reader:
-            # Add values to the evidence list
-            evidenceRowList = create_list(row)
-            evidence.append(evidenceRowList)
+    (Both are returned as NumPy arrays, with one row of evidence per list.)
+    """
+    # Load shopping.csv at once, keeping the text columns as strings
+    # (otherwise TRUE and FALSE would be read as booleans)
+    data = pd.read_csv(filename, encoding="utf-8", dtype={
+        "Month": str, "VisitorType": str, "Weekend": str, "Revenue": str
+    })
 
-            # Add values to the label list
-            lab = true_or_false(row["Revenue"])
-            label.append(lab)
-    
-    return (evidence, label)
+    # Convert the text columns to integers, a whole column at a time
+    # (the index of each month is its category code, so no lookups are needed)
+    data["Month"] = pd.Categorical(data["Month"], categories=MONTHS).codes
+    data["VisitorType"] = data["VisitorType"].eq("Returning_Visitor").astype(np.int8)
+    data["Weekend"] = data["Weekend"].eq("TRUE").astype(np.int8)
 
+    # Evidence as a 2D array (one row per user), and the labels
+    evidence = data[EVIDENCE_COLUMNS].to_numpy(dtype=float)
+    labels = data["Revenue"].eq("TRUE").astype(np.int8).to_numpy()
 
-def create_list(row):
-    """
-    Given a row from the csv file, return a list to be added to evidence.
-    It converts all values from the csv file to integer or float.
-    """
-    evidence_list = []
-    adm = int(row["Administrative"])
-    admDuration = float(row["Administrative_Duration"])
-    inf = int(row["Informational"])
-    infDuration = float(row["Informational_Duration"])
-    prdRel = int(row["ProductRelated"])
-    prdRelDuration = float(row["ProductRelated_Duration"])
-    bounce = float(row["BounceRates"])
-    exit = float(row["ExitRates"])
-    page = float(row["PageValues"])
-    special = float(row["SpecialDay"])
-    month = month_to_int(row["Month"])
-    oper = int(row["OperatingSystems"])
-    browser = int(row["Browser"])
-    region = int(row["Region"])
-    traffic = int(row["TrafficType"])
-    visitor = visit_to_int(row["VisitorType"])
-    weekend = true_or_false(row["Weekend"])
-    evidence_list.append(adm)
-    evidence_list.append(admDuration)
-    evidence_list.append(inf)
-    evidence_list.append(infDuration)
-    evidence_list.append(prdRel)
-    evidence_list.append(prdRelDuration)
-    evidence_list.append(bounce)
-    evidence_list.append(exit)
-    evidence_list.append(page)
-    evidence_list.append(special)
-    evidence_list.append(month)
-    evidence_list.append(oper)
-    evidence_list.append(browser)
-    evidence_list.append(region)
-    evidence_list.append(traffic)
-    evidence_list.append(visitor)
-    evidence_list.append(weekend)
-
-    return evidence_list
-
-
-def visit_to_int(visitor_type):
-    switcher = {
-        "Returning_Visitor":1,
-        "New_Visitor":0,
-        "Other":0
-    }
-
-    return switcher.get(visitor_type)
-
-
-def true_or_false(input):
-    switcher = {
-        "TRUE":1,
-        "FALSE":0
-    }
-
-    return switcher.get(input)
-
-
-def month_to_int(month):
-    switcher = {
-        "Jan":0,
-        "Feb":1,
-        "Mar":2,
-        "Apr":3,
-        "May":4,
-        "June":5,
-        "Jul":6,
-        "Aug":7,
-        "Sep":8,
-        "Oct":9,
-        "Nov":10,
-        "Dec":11
-    }
-
-    return switcher.get(month)
+    return (evidence, labels)
 
 
 def train_model(evidence, labels):
@@ -168,7 +102,13 @@ def train_model(evidence, labels):
     Given a list of evidence lists and a list of labels, return a
     fitted k-nearest neighbor model (k=1) trained on the data.
     """
-    model = KNeighborsClassifier(n_neighbors=1)
+    # Features are standardized, so that no feature dominates the distances
+    # because of its scale. Neighbors are found with a k-d tree (the features
+    # are few), and predictions are made on all cores
+    model = make_pipeline(
+        StandardScaler(),
+        KNeighborsClassifier(n_neighbors=1, algorithm="kd_tree", n_jobs=-1)
+    )
     return model.fit(evidence, labels)
 
 
@@ -187,15 +127,22 @@ def evaluate(labels, predictions):
     representing the "true negative rate": the proportion of
     actual negative labels that were accurately identified.
     """
-    sensitivity = 0
-    specificity = 0
-    for i in range(len(predictions)):
-        if labels[i] == 1 and predictions[i] == 1:
-            sensitivity += 1
-        elif labels[i] == 0 and predictions[i] == 0:
-            specificity += 1
-
-    return ((sensitivity / labels.count(1)), (specificity / labels.count(0)))
+    labels = np.asarray(labels)
+    predictions = np.asarray(predictions)
+
+    # Positive labels are found once, and reused for every count
+    # (each label is either 1 or 0, so the rest of them are negative)
+    is_positive = labels == 1
+    positives = int(is_positive.sum())
+    negatives = labels.size - positives
+
+    # Count the accurately identified labels of each kind
+    true_positives = int((predictions[is_positive] == 1).sum())
+    true_negatives = int((predictions[~is_positive] == 0).sum())
+
+    sensitivity = true_positives / positives
+    specificity = true_negatives / negatives
+    return (sensitivity, specificity)
 
 
 if __name__ == "__main__":
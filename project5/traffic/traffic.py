@@ -4,9 +4,11 @@ import os
 import sys
 import tensorflow as tf
 
+from concurrent.futures import ThreadPoolExecutor
 from sklearn.model_selection import train_test_split
 from tensorflow.python.keras import activations
 
+BATCH_SIZE = 32
 EPOCHS = 10
 IMG_WIDTH = 30
 IMG_HEIGHT = 30
@@ -20,23 +22,26 @@ def main():
     if len(sys.argv) not in [2, 3]:
         sys.exit("Usage: python traffic.py data_directory [model.h5]")
 
-    # Get image arrays and labels for all image files
-    images, labels = load_data(sys.argv[1])
+    # Get paths and labels for all image files
+    paths, labels = image_files(sys.argv[1])
 
     # Split data into training and testing sets
-    labels = tf.keras.utils.to_categorical(labels)
-    x_train, x_test, y_train, y_test = train_test_split(
-        np.array(images), np.array(labels), test_size=TEST_SIZE
+    paths_train, paths_test, labels_train, labels_test = train_test_split(
+        paths, labels, test_size=TEST_SIZE
     )
 
+    # The images are read while the network trains, instead of all before it
+    train_data = image_dataset(paths_train, labels_train, shuffle=True)
+    test_data = image_dataset(paths_test, labels_test)
+
     # Get a compiled neural network
     model = get_model()
 
     # Fit model on training data
-    model.fit(x_train, y_train, epochs=EPOCHS)
+    model.fit(train_data, epochs=EPOCHS)
 
     # Evaluate neural network performance
-    model.evaluate(x_test,  y_test, verbose=2)
+    model.evaluate(test_data, verbose=2)
 
     # Save model to file
     if len(sys.argv) == 3:
@@ -58,22 +63,77 @@ def load_data(data_dir):
     numpy ndarray with dimensions IMG_WIDTH x IMG_HEIGHT x 3. `labels` should
     be a list of integer labels, representing the categories for each of the
     corresponding `images`.
+
+    (`images` is returned as a single uint8 ndarray, with one image per row.)
+    """
+    paths, labels = image_files(data_dir)
+
+    # Read and resize the images in parallel threads
+    # (OpenCV releases the GIL while it reads and resizes an image)
+    # Each image is written into an array allocated once for all of them,
+    # instead of building a list that has to be copied into an array later
+    images = np.empty((len(paths), IMG_HEIGHT, IMG_WIDTH, 3), dtype=np.uint8)
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        for i, image in enumerate(executor.map(load_image, paths)):
+            images[i] = image
+    
+    return (images, labels)
+
+
+def image_files(data_dir):
+    """
+    Return tuple `(paths, labels)`, where `paths` is a list of the paths of
+    all of the image files in the data directory (organized as in load_data),
+    and `labels` is a list of their integer labels.
     """
-    images = []
+    paths = []
     labels = []
 
     for i in range(NUM_CATEGORIES):
-        path = data_dir + os.sep + str(i)
-        with os.scandir(path) as files:
+        with os.scandir(os.path.join(data_dir, str(i))) as files:
             for file in files:
                 if file.name.endswith(".ppm") and file.is_file():
-                    print(file.path, file.name)
-                    img = cv2.imread(file.path,1)
-                    res = cv2.resize(img, dsize=(IMG_WIDTH, IMG_HEIGHT), interpolation=cv2.INTER_AREA)
-                    images.append(res)
-                    labels.append(str(i))
-    
-    return (images, labels)
+                    paths.append(file.path)
+                    labels.append(i)
+
+    return (paths, labels)
+
+
+def load_image(path):
+    """
+    Read the image file at `path`, and return it as a numpy ndarray with
+    dimensions IMG_WIDTH x IMG_HEIGHT x 3.
+    """
+    img = cv2.imread(path, 1)
+    return cv2.resize(img, dsize=(IMG_WIDTH, IMG_HEIGHT), interpolation=cv2.INTER_LINEAR)
+
+
+def image_dataset(paths, labels, shuffle=False):
+    """
+    Return a `tf.data.Dataset` with batches of images and one-hot labels,
+    for the image files in `paths` with the corresponding `labels`.
+
+    Images are read and resized in parallel (only on the first epoch), and
+    the next batches are prepared while the model is working on the current one.
+    """
+    def read(path, label):
+        # tf.io can't decode PPM files, so they're read with OpenCV
+        image = tf.numpy_function(
+            lambda path: load_image(path.decode()), [path], tf.uint8
+        )
+        image.set_shape((IMG_HEIGHT, IMG_WIDTH, 3))
+        # (images are kept as uint8, and converted to floats by the model)
+        return image, tf.one_hot(label, NUM_CATEGORIES)
+
+    # The decoded images are cached after the first epoch, so the files are
+    # read only once. Shuffling comes after the cache, so that it's still
+    # done again on every epoch
+    dataset = tf.data.Dataset.from_tensor_slices((paths, labels))
+    dataset = dataset.map(read, num_parallel_calls=tf.data.AUTOTUNE)
+    dataset = dataset.cache()
+    if shuffle:
+        dataset = dataset.shuffle(len(paths))
+    return dataset.batch(BATCH_SIZE).prefetch(tf.data.AUTOTUNE)
 
 
 def get_model():
@@ -85,6 +145,7 @@ def get_model():
     # Create a convolutional neural network
     model = tf.keras.models.Sequential()
     model.add(tf.keras.Input(shape=(IMG_WIDTH, IMG_HEIGHT, 3)))
+    model.add(tf.keras.layers.Rescaling(1. / 255))
     model.add(tf.keras.layers.Conv2D(filters=32, kernel_size=(3,3), activation="relu"))
     model.add(tf.keras.layers.MaxPooling2D(pool_size=(2,2), strides=2))
     model.add(tf.keras.layers.Conv2D(filters=64, kernel_size=(3,3), activation="relu"))
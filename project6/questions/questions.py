@@ -1,12 +1,37 @@
 import nltk
+import numpy as np
 import sys
 import os
 import string
 import math
 
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
 FILE_MATCHES = 3
 SENTENCE_MATCHES = 10
 
+# NLTK data used by the module, downloaded once if it isn't installed yet
+# (everything is then loaded from it once, below, and reused on every call)
+for resource, package in [
+    ("corpora/stopwords", "stopwords"),
+    ("tokenizers/punkt_tab", "punkt_tab")
+]:
+    try:
+        nltk.data.find(resource)
+    except LookupError:
+        nltk.download(package, quiet=True)
+
+# Punctuation and English stopwords, loaded once as sets for fast lookups
+PUNCTUATION = frozenset(string.punctuation)
+STOPWORDS = frozenset(nltk.corpus.stopwords.words("english"))
+
+# Sentence and word tokenizers, created once and reused for every document
+# (the same ones that nltk.sent_tokenize and nltk.word_tokenize use)
+SENTENCE_TOKENIZER = nltk.tokenize.PunktTokenizer("english")
+WORD_TOKENIZER = nltk.tokenize.NLTKWordTokenizer()
+
 
 def main():
 
@@ -32,7 +57,7 @@ def main():
     sentences = dict()
     for filename in filenames:
         for passage in files[filename].split("\n"):
-            for sentence in nltk.sent_tokenize(passage):
+            for sentence in SENTENCE_TOKENIZER.tokenize(passage):
                 tokens = tokenize(sentence)
                 if tokens:
                     sentences[sentence] = tokens
@@ -51,14 +76,21 @@ def load_files(directory):
     Given a directory name, return a dictionary mapping the filename of each
     `.txt` file inside that directory to the file's contents as a string.
     """
-    map_dict = dict()
-
     with os.scandir(directory) as files:
-        for file in files:
-            if file.name.endswith(".txt") and file.is_file():
-                f = open(file.path, mode='r')
-                all_lines = f.read()
-                map_dict[file.name] = all_lines
+        text_files = [
+            file for file in files
+            if file.name.endswith(".txt") and file.is_file()
+        ]
+
+    # Read the files in parallel threads (each one is closed after reading)
+    with ThreadPoolExecutor() as executor:
+        contents = executor.map(
+            lambda file: Path(file.path).read_text(encoding="utf-8"), text_files
+        )
+        map_dict = {
+            file.name: all_lines
+            for file, all_lines in zip(text_files, contents)
+        }
     
     return map_dict
 
@@ -72,12 +104,12 @@ def tokenize(document):
     punctuation or English stopwords.
     """
     all_words = [
-        word.lower() for word in nltk.word_tokenize(document)
-        if not word in string.punctuation and not word in nltk.corpus.stopwords.words("english")
+        word
+        for sentence in SENTENCE_TOKENIZER.tokenize(document)
+        for word in map(str.lower, WORD_TOKENIZER.tokenize(sentence))
+        if word not in PUNCTUATION and word not in STOPWORDS
     ]
 
-    all_words.sort()
-
     return all_words
 
 
@@ -89,13 +121,14 @@ def compute_idfs(documents):
     Any word that appears in at least one of the documents should be in the
     resulting dictionary.
     """
-    words = set()
+    # Number of documents in which each word appears, counted in one pass
+    # (each document is turned into a set, so a word is counted once per document)
+    frequencies = Counter()
     for filename in documents:
-        words.update(documents[filename])
+        frequencies.update(set(documents[filename]))
 
     idfs_values = dict()
-    for word in words:
-        f = sum(word in documents[filename] for filename in documents.keys())
+    for word, f in frequencies.items():
         idf = math.log(len(documents) / f)
         idfs_values[word] = idf
 
@@ -109,20 +142,22 @@ def top_files(query, files, idfs, n):
     to their IDF values), return a list of the filenames of the the `n` top
     files that match the query, ranked according to tf-idf.
     """
-    tf_idf = {filename:0 for filename in files}
-
-    for filename in files:
-        list_of_words = files[filename]
+    # Files in order, and their tf-idf in an array with the same order
+    filenames = list(files)
+    tf_idf = np.zeros(len(filenames))
+
+    for i, filename in enumerate(filenames):
+        # Number of times each word appears in the file, counted once
+        # (a word that isn't in a file has tf 0, so its idf doesn't matter)
+        frequencies = Counter(files[filename])
         result = 0.0
         for q_word in query:
-            tf = list_of_words.count(q_word)
-            idf = idfs[q_word] if q_word in list_of_words else 0
-            result = (tf * idf) + result
-        tf_idf[filename] = result
-
-    tf_idf_list_sorted = sorted(tf_idf, key=tf_idf.get, reverse=True)
+            tf = frequencies[q_word]
+            if tf:
+                result = (tf * idfs[q_word]) + result
+        tf_idf[i] = result
 
-    return tf_idf_list_sorted[:n]
+    return [filenames[i] for i in top_indices(n, tf_idf)]
 
 
 def top_sentences(query, sentences, idfs, n):
@@ -133,29 +168,44 @@ def top_sentences(query, sentences, idfs, n):
     the query, ranked according to idf. If there are ties, preference should
     be given to sentences that have a higher query term density.
     """
-    dict_result = {
-        sentence: {
-            "idf": 0.0,
-            "density": 0.0
-        } for sentence in sentences
-    }
+    # Sentences in order, and their idf and density in arrays with the same order
+    sentence_list = list(sentences)
+    idf_values = np.zeros(len(sentence_list))
+    densities = np.zeros(len(sentence_list))
 
-    for sentence in sentences:
-        idf = 0.0
-        total_words_found = 0
-        for q_word in query:
-            if q_word in sentences[sentence]:
-                total_words_found += 1
-                idf += idfs[q_word]
-        
-        density = float(total_words_found) / len(sentences[sentence])
-        
-        dict_result[sentence]["idf"] = idf
-        dict_result[sentence]["density"] = density
-    
-    n_top_sentences = sorted(dict_result.items(), key=lambda x: (x[1]["idf"], x[1]["density"]), reverse=True)
+    for i, sentence in enumerate(sentence_list):
+        # Words of the sentence as a set, to check each query word in O(1)
+        # (the list is still needed for the density)
+        words = set(sentences[sentence])
+        words_found = [q_word for q_word in query if q_word in words]
+        idf_values[i] = sum(idfs[q_word] for q_word in words_found)
+        densities[i] = len(words_found) / len(sentences[sentence])
+
+    return [sentence_list[i] for i in top_indices(n, idf_values, densities)]
 
-    return [x[0] for x in n_top_sentences[:n]]
+
+def top_indices(n, scores, tie_scores=None):
+    """
+    Return a list of the indexes of the `n` highest `scores`, from the highest
+    to the lowest. Ties are broken by the highest `tie_scores` (if given),
+    and then by the lowest index.
+    """
+    # Only the indexes with a score of at least the n-th highest one can be in
+    # the top n. np.partition finds that score in linear time, so only those
+    # indexes have to be sorted, instead of all of them
+    if n < len(scores):
+        threshold = -np.partition(-scores, n - 1)[n - 1]
+        candidates = np.flatnonzero(scores >= threshold)
+    else:
+        candidates = np.arange(len(scores))
+
+    # lexsort sorts by the last key first, and keeps ties in order.
+    # Keys are negated for a descending order
+    if tie_scores is None:
+        keys = (-scores[candidates],)
+    else:
+        keys = (-tie_scores[candidates], -scores[candidates])
+    return candidates[np.lexsort(keys)][:n].tolist()
 
 
 if __name__ == "__main__":